@@ -4,10 +4,13 @@ Calendar Agent - Detects dates/times in text and generates .ics calendar files
 """
 import re
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Tuple
+import logging
+from functools import cache, lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, NamedTuple, Set, Tuple
 from pathlib import Path
 import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
 try:
     from dateutil import parser as date_parser
@@ -16,16 +19,119 @@ try:
 except ImportError:
     DATEUTIL_AVAILABLE = False
 
-try:
-    from icalendar import Calendar, Event
-    ICALENDAR_AVAILABLE = True
-except ImportError:
-    ICALENDAR_AVAILABLE = False
+# Child of dedalus_agent's "dedalus" logger, so errors go to stderr with its handler
+# and never onto the stdout protocol stream
+log = logging.getLogger("dedalus.calendar")
+
+# Clock time formats tried with strptime before falling back to dateutil
+_FAST_TIME_FORMATS = (
+    "%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I:%M:%S %p", "%I %p", "%I%p",
+)
+
+# Fuzzy parsing only sees this many characters either side of the first date/time
+# match (or the first _FUZZY_FALLBACK_CHARS without one). Windows up to
+# _FUZZY_INLINE_CHARS parse in about a millisecond even on adversarial input, so
+# they run inline; longer ones (a match with a huge run of whitespace) go to the
+# pool and are abandoned after _FUZZY_TIMEOUT seconds, since dateutil can take
+# minutes on long input
+_FUZZY_CONTEXT_CHARS = 64
+_FUZZY_FALLBACK_CHARS = 256
+_FUZZY_INLINE_CHARS = 256
+_FUZZY_TIMEOUT = 0.25
+_fuzzy_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="calendar-fuzzy")
+
+# Entries kept by each per-text cache on CalendarAgent
+_CACHE_SIZE = 16
+
+# Parses whose start lands within this many seconds of now are treated as
+# dateutil falling back to its default rather than a real date in the text
+_MIN_CONFIDENT_OFFSET = 60
+
+# Anything outside a date match that could still be part of a time ("at 1900",
+# "7 p.m.", "19h30"); when present, the fast path leaves the text to dateutil
+_TIME_HINT_RE = re.compile(r'\d|\b[ap]\.?m\b', re.IGNORECASE)
+
+# Clock times such as "14:00", "3:30 PM" or "2pm"
+_CLOCK_RE = re.compile(
+    r'\b\d{1,2}(?::\d{2}){0,2}\s*(?:am|pm)\b|\b\d{1,2}:\d{2}(?::\d{2})?\b',
+    re.IGNORECASE,
+)
+
+# Fixed RFC 5545 skeleton for the single-event calendars this agent writes
+_ICS_TEMPLATE = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//Calendar Agent//EN\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:{uid}\r\n"
+    "DTSTAMP:{stamp}\r\n"
+    "DTSTART:{start}\r\n"
+    "DTEND:{end}\r\n"
+    "SUMMARY:{summary}\r\n"
+    "DESCRIPTION:{description}\r\n"
+    "END:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+def _ics_datetime(value: datetime) -> str:
+    """Format a datetime as an iCalendar DATE-TIME (UTC-suffixed when timezone-aware)"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _ics_text(value: str) -> str:
+    """Escape a TEXT property value per RFC 5545 section 3.3.11"""
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n"))
+
+
+def _ics_fold(content: str) -> str:
+    """Fold content lines longer than 75 octets per RFC 5545 section 3.1, never inside a UTF-8 character"""
+    lines = []
+    for line in content.split("\r\n"):
+        if len(line.encode("utf-8")) <= 75:
+            lines.append(line)
+            continue
+        piece, size = [], 0
+        for char in line:
+            width = len(char.encode("utf-8"))
+            if size + width > 75:
+                lines.append("".join(piece))
+                # Continuation lines start with a space, which counts toward the limit
+                piece, size = [" "], 1
+            piece.append(char)
+            size += width
+        lines.append("".join(piece))
+    return "\r\n".join(lines)
+
+
+class _Match(NamedTuple):
+    """A date or time pattern hit, with the strptime formats of the pattern that matched"""
+    start: int
+    end: int
+    text: str
+    kind: str
+    formats: Tuple[str, ...]
+
+
+def _strptime_any(value: str, formats: Tuple[str, ...]) -> Optional[datetime]:
+    """Return the first successful strptime of value against formats, or None"""
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
 
 
 class CalendarAgent:
     """Agent that detects dates/times and generates .ics calendar files"""
     
+    # Output directories already created in this process
+    _created_dirs: Set[Path] = set()
+    
     def __init__(self, output_dir: str = "calendar_files"):
         """
         Initialize the calendar agent
@@ -34,34 +140,36 @@ class CalendarAgent:
             output_dir: Directory to save generated .ics files
         """
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+        if self.output_dir not in CalendarAgent._created_dirs:
+            self.output_dir.mkdir(exist_ok=True)
+            CalendarAgent._created_dirs.add(self.output_dir)
         
-        # Date/time patterns
+        # Date/time patterns as (regex, strptime formats); matches with no format that
+        # fits go to dateutil. More specific patterns come first: the union regexes
+        # take the first alternative that matches at a given position
         self.date_patterns = [
             # ISO dates: 2024-01-15, 2024/01/15
-            r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b',
-            # US dates: 01/15/2024, 1/15/24
-            r'\b\d{1,2}/\d{1,2}/\d{2,4}\b',
-            # European dates: 15/01/2024, 15/1/24
-            r'\b\d{1,2}/\d{1,2}/\d{2,4}\b',
-            # Month day: January 15, Jan 15, Jan 15th
-            r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2}(?:st|nd|rd|th)?\b',
+            (r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b', ('%Y-%m-%d', '%Y/%m/%d')),
+            # US or European dates: 01/15/2024, 1/15/24, 15/01/2024 (US read tried first)
+            (r'\b\d{1,2}/\d{1,2}/\d{2,4}\b', ('%m/%d/%Y', '%m/%d/%y', '%d/%m/%Y', '%d/%m/%y')),
             # Full month names: January 15, 2024
-            r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b',
+            (r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b', ('%B %d, %Y', '%B %d %Y')),
+            # Month day: January 15, Jan 15, Jan 15th
+            (r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2}(?:st|nd|rd|th)?\b', ()),
             # Relative dates: today, tomorrow, next week, next Monday
-            r'\b(?:today|tomorrow|next\s+(?:week|month|monday|tuesday|wednesday|thursday|friday|saturday|sunday))\b',
+            (r'\b(?:today|tomorrow|next\s+(?:week|month|monday|tuesday|wednesday|thursday|friday|saturday|sunday))\b', ()),
             # Day of week: Monday, Tuesday, etc.
-            r'\b(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\b',
+            (r'\b(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\b', ()),
         ]
         
         # Time patterns
         self.time_patterns = [
-            # 24-hour: 14:30, 14:30:00
-            r'\b\d{1,2}:\d{2}(?::\d{2})?\b',
             # 12-hour: 2:30 PM, 2:30pm, 14:30
-            r'\b\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)\b',
+            (r'\b\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)\b', ('%I:%M %p', '%I:%M%p')),
+            # 24-hour: 14:30, 14:30:00
+            (r'\b\d{1,2}:\d{2}(?::\d{2})?\b', ('%H:%M', '%H:%M:%S')),
             # Time words: morning, afternoon, evening, noon, midnight
-            r'\b(?:morning|afternoon|evening|noon|midnight)\b',
+            (r'\b(?:morning|afternoon|evening|noon|midnight)\b', ()),
         ]
         
         # Combined date-time patterns
@@ -69,6 +177,54 @@ class CalendarAgent:
             r'\b(?:at|@)\s+\d{1,2}:\d{2}',
             r'\b\d{1,2}:\d{2}\s+(?:AM|PM|am|pm)',
         ]
+        
+        # Single alternations compiled once, so detection and parsing scan the
+        # text once per pattern group instead of once per pattern. Date and time
+        # alternatives are named d0, d1, ... / t0, t1, ... so a match's lastgroup
+        # finds its strptime formats
+        self._date_union = self._compile_union([p for p, _ in self.date_patterns], 'd')
+        self._time_union = self._compile_union([p for p, _ in self.time_patterns], 't')
+        self._dt_union = self._compile_union(self.datetime_patterns)
+        self._formats = {f'd{i}': fmts for i, (_, fmts) in enumerate(self.date_patterns)}
+        self._formats.update({f't{i}': fmts for i, (_, fmts) in enumerate(self.time_patterns)})
+        
+        # Common date/time keywords, and time indicators that must accompany them
+        date_keywords = [
+            'meeting', 'appointment', 'schedule', 'calendar', 'event',
+            'tomorrow', 'today', 'next week', 'next month',
+            'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+            'january', 'february', 'march', 'april', 'may', 'june',
+            'july', 'august', 'september', 'october', 'november', 'december'
+        ]
+        time_indicators = ['at', '@', ':', 'am', 'pm', 'morning', 'afternoon', 'evening']
+        
+        # Plain (unanchored) alternations keep the substring semantics of `keyword in text`
+        self._kw_re = re.compile("|".join(map(re.escape, date_keywords)), re.IGNORECASE)
+        self._time_ind_re = re.compile("|".join(map(re.escape, time_indicators)), re.IGNORECASE)
+        
+        # Summary patterns like "meeting about X", "call with Y", tried in order
+        self._summary_res = [re.compile(p, re.IGNORECASE) for p in [
+            r'meeting\s+(?:about|regarding|for|with)\s+([^.?!]+)',
+            r'call\s+(?:with|about)\s+([^.?!]+)',
+            r'appointment\s+(?:with|for)\s+([^.?!]+)',
+            r'event\s+(?:called|titled)\s+([^.?!]+)',
+        ]]
+        self._sent_end = re.compile(r'[.!?]')
+        
+        # Memoized results keyed on the raw text (parse results also on the current minute,
+        # since relative dates like "tomorrow" depend on when they are parsed). Queries
+        # carry the whole conversation and rarely repeat, so the reuse is within one
+        # process_text call and the caches stay small rather than pinning old texts
+        self._scan_cache = lru_cache(maxsize=_CACHE_SIZE)(self._scan)
+        self._parse_cache = lru_cache(maxsize=_CACHE_SIZE)(self._parse_event)
+        self._summary_cache = lru_cache(maxsize=_CACHE_SIZE)(self._summarize)
+    
+    @staticmethod
+    def _compile_union(patterns: List[str], prefix: Optional[str] = None) -> "re.Pattern":
+        """Compile a list of patterns into one case-insensitive alternation, optionally naming each alternative"""
+        if prefix:
+            return re.compile("|".join(f"(?P<{prefix}{i}>{p})" for i, p in enumerate(patterns)), re.IGNORECASE)
+        return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
     
     def detect_dates(self, text: str) -> bool:
         """
@@ -80,40 +236,33 @@ class CalendarAgent:
         Returns:
             True if dates/times are detected, False otherwise
         """
-        text_lower = text.lower()
-        
-        # Check for date patterns
-        for pattern in self.date_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True
-        
-        # Check for time patterns
-        for pattern in self.time_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True
-        
-        # Check for combined datetime patterns
-        for pattern in self.datetime_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True
+        return self._scan_cache(text)[0]
+    
+    def _scan(self, text: str) -> Tuple[bool, Tuple[_Match, ...]]:
+        """
+        Run the date/time regexes over text once for both detection and parsing
         
-        # Check for common date/time keywords
-        date_keywords = [
-            'meeting', 'appointment', 'schedule', 'calendar', 'event',
-            'tomorrow', 'today', 'next week', 'next month',
-            'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
-            'january', 'february', 'march', 'april', 'may', 'june',
-            'july', 'august', 'september', 'october', 'november', 'december'
-        ]
+        Args:
+            text: Input text to analyze
+            
+        Returns:
+            (dates detected, date/time matches sorted by position)
+        """
+        # All patterns are compiled with IGNORECASE, so no lowered copy is needed
+        matches = [_Match(m.start(), m.end(), m.group(), 'date', self._formats[m.lastgroup])
+                   for m in self._date_union.finditer(text)]
+        matches += [_Match(m.start(), m.end(), m.group(), 'time', self._formats[m.lastgroup])
+                    for m in self._time_union.finditer(text)]
         
-        if any(keyword in text_lower for keyword in date_keywords):
-            # Additional check: look for time indicators nearby
-            time_indicators = ['at', '@', ':', 'am', 'pm', 'morning', 'afternoon', 'evening']
-            for indicator in time_indicators:
-                if indicator in text_lower:
-                    return True
+        # Sort by position in text
+        matches.sort(key=lambda m: m.start)
         
-        return False
+        # Check for date, time and combined datetime patterns, then for common
+        # date/time keywords plus a time indicator
+        detected = bool(matches
+                        or self._dt_union.search(text)
+                        or (self._kw_re.search(text) and self._time_ind_re.search(text)))
+        return detected, tuple(matches)
     
     def parse_date_time(self, text: str) -> Optional[Dict]:
         """
@@ -123,23 +272,70 @@ class CalendarAgent:
             text: Input text containing date/time information
             
         Returns:
-            Dictionary with parsed date/time info or None
+            Dictionary with 'start', 'end', 'summary', 'description' and 'confident',
+            or None; 'confident' is False when the start is indistinguishable from the
+            parse time (likely a false positive), and process_text skips such events
         """
+        minute = datetime.now().replace(second=0, microsecond=0)
+        event = self._parse_cache(text, minute)
+        if not event:
+            return None
+        
+        start, end, summary, description, confident = event
+        return {
+            'start': start,
+            'end': end,
+            'summary': summary,
+            'description': description,
+            'confident': confident,
+        }
+    
+    def _parse_event(self, text: str, minute: datetime) -> Optional[Tuple[datetime, datetime, str, str, bool]]:
+        """
+        Cacheable form of _parse_date_time returning a (start, end, summary, description, confident) tuple
+        
+        `minute` is only part of the cache key, so cached relative dates expire each minute.
+        """
+        event_info = self._parse_date_time(text)
+        if not event_info:
+            return None
+        return (event_info['start'], event_info['end'], event_info['summary'],
+                event_info['description'], event_info['confident'])
+    
+    def _parse_date_time(self, text: str) -> Optional[Dict]:
+        """Uncached body of parse_date_time"""
+        # One clock reading per parse, so relative dates and checks agree with each other
+        now = datetime.now()
+        
+        # Reuse the regex matches from detection (cached per text)
+        date_time_matches = self._scan_cache(text)[1]
+        
+        # Fast path: standard date (and clock time) formats via strptime
+        fast_dt = self._fast_parse(text, date_time_matches, now)
+        if fast_dt:
+            return {
+                'start': fast_dt,
+                'end': fast_dt + timedelta(hours=1),
+                'summary': self._extract_summary(text),
+                'description': text[:500],
+                'confident': abs((fast_dt - now).total_seconds()) > _MIN_CONFIDENT_OFFSET,
+            }
+        
         if not DATEUTIL_AVAILABLE:
             return None
         
         try:
-            # First, try to parse the entire text with dateutil (handles natural language well)
+            # First, try to parse the text around the first match with dateutil (handles natural language well)
             try:
                 # Use dateutil's fuzzy parsing which handles natural language
-                parsed_dt = date_parser.parse(text, fuzzy=True, default=datetime.now())
+                parsed_dt = self._fuzzy_parse(self._fuzzy_window(text, date_time_matches), now)
                 
                 # Check if we actually got a reasonable date (not just default)
                 # If the parsed date is very close to now, it might be a false positive
-                time_diff = abs((parsed_dt - datetime.now()).total_seconds())
+                time_diff = abs((parsed_dt - now).total_seconds())
                 
                 # If we found a date that's more than 1 minute different from now, or if it's in the future
-                if time_diff > 60 or parsed_dt > datetime.now():
+                if time_diff > 60 or parsed_dt > now:
                     # Extract time components
                     start_dt = parsed_dt.replace(second=0, microsecond=0)
                     end_dt = start_dt + timedelta(hours=1)
@@ -149,67 +345,62 @@ class CalendarAgent:
                         'end': end_dt,
                         'summary': self._extract_summary(text),
                         'description': text[:500],
+                        'confident': time_diff > _MIN_CONFIDENT_OFFSET,
                     }
-            except (ValueError, TypeError):
+            except (ValueError, TypeError, OverflowError, FuturesTimeout):
                 pass
             
-            # Fallback: Extract potential date/time strings manually
-            date_time_matches = []
-            
-            # Find date patterns
-            for pattern in self.date_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    date_time_matches.append((match.start(), match.group(), 'date'))
-            
-            # Find time patterns
-            for pattern in self.time_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    date_time_matches.append((match.start(), match.group(), 'time'))
-            
+            # Fallback: use the potential date/time strings found by the scan
             if not date_time_matches:
                 return None
             
-            # Sort by position in text
-            date_time_matches.sort(key=lambda x: x[0])
-            
             # Try to parse dates and times
             parsed_date = None
             parsed_time = None
             
-            for _, match_text, match_type in date_time_matches:
+            # Lowered lazily, and only once, when the first date match needs it
+            text_lower = None
+            
+            for _, _, match_text, match_type, formats in date_time_matches:
                 try:
                     if match_type == 'date':
                         # Handle relative dates
-                        match_lower = match_text.lower()
-                        text_lower = text.lower()
+                        if text_lower is None:
+                            text_lower = text.lower()
                         
                         if 'today' in text_lower:
-                            parsed_date = datetime.now()
+                            parsed_date = now
                         elif 'tomorrow' in text_lower:
-                            parsed_date = datetime.now() + timedelta(days=1)
+                            parsed_date = now + timedelta(days=1)
                         elif 'next week' in text_lower:
-                            parsed_date = datetime.now() + timedelta(weeks=1)
+                            parsed_date = now + timedelta(weeks=1)
                         elif 'next month' in text_lower:
-                            parsed_date = datetime.now() + relativedelta(months=1)
+                            parsed_date = now + relativedelta(months=1)
                         else:
-                            # Try to parse the date string
-                            parsed_date = date_parser.parse(match_text, default=datetime.now())
+                            # Try the pattern's known formats, then dateutil (time filled from now either way)
+                            parsed_date = _strptime_any(match_text, formats)
+                            if parsed_date:
+                                parsed_date = datetime.combine(parsed_date.date(), now.time())
+                            else:
+                                parsed_date = date_parser.parse(match_text, default=now)
                     elif match_type == 'time':
                         # Parse time
                         time_str = match_text
+                        known_time = _strptime_any(time_str, formats)
+                        if known_time:
+                            parsed_time = known_time.time()
+                            continue
                         try:
                             if 'am' in time_str.lower() or 'pm' in time_str.lower():
                                 # 12-hour format
-                                parsed_time = date_parser.parse(time_str, default=datetime.now()).time()
+                                parsed_time = date_parser.parse(time_str, default=now).time()
                             else:
                                 # 24-hour format
-                                parsed_time = date_parser.parse(time_str, default=datetime.now()).time()
+                                parsed_time = date_parser.parse(time_str, default=now).time()
                         except:
                             # Try parsing with context
                             try:
-                                parsed_time = date_parser.parse(f"{time_str} {datetime.now().year}", default=datetime.now()).time()
+                                parsed_time = date_parser.parse(f"{time_str} {now.year}", default=now).time()
                             except:
                                 pass
                 except Exception:
@@ -223,7 +414,7 @@ class CalendarAgent:
                     if parsed_time:
                         dt = dt.replace(hour=parsed_time.hour, minute=parsed_time.minute, second=0, microsecond=0)
                 else:
-                    dt = datetime.combine(parsed_date.date(), parsed_time or datetime.now().time())
+                    dt = datetime.combine(parsed_date.date(), parsed_time or now.time())
                     dt = dt.replace(second=0, microsecond=0)
                 
                 # Default to 1 hour duration if no end time specified
@@ -234,38 +425,99 @@ class CalendarAgent:
                     'end': end_dt,
                     'summary': self._extract_summary(text),
                     'description': text[:500],  # First 500 chars as description
+                    'confident': abs((dt - now).total_seconds()) > _MIN_CONFIDENT_OFFSET,
                 }
         
         except Exception as e:
-            print(f"Error parsing date/time: {e}")
+            log.warning("Error parsing date/time: %s", e)
             return None
         
         return None
     
+    def _fast_parse(self, text: str, matches: Tuple[_Match, ...], now: datetime) -> Optional[datetime]:
+        """
+        Parse text whose date is in a known format without dateutil
+        
+        Args:
+            text: Input text containing date/time information
+            matches: Date/time matches from _scan
+            now: Parse time; its time of day is used when the text has no clock time,
+                as in the dateutil and regex fallback paths
+            
+        Returns:
+            Parsed start datetime, or None if the text needs the fuzzy parser
+        """
+        match = next((m for m in matches if m.kind == 'date'), None)
+        if not match:
+            return None
+        
+        parsed_dt = _strptime_any(match.text, match.formats)
+        if not parsed_dt:
+            return None
+        
+        # A clock time we cannot read means the fuzzy parser should handle it
+        clock = _CLOCK_RE.search(text)
+        if clock:
+            parsed_time = _strptime_any(clock.group(0), _FAST_TIME_FORMATS)
+            if not parsed_time:
+                return None
+            return parsed_dt.replace(hour=parsed_time.hour, minute=parsed_time.minute)
+        
+        # No clock time we can read: only default to now's time of day when nothing
+        # else in the text could be a time in a form _CLOCK_RE does not cover
+        if _TIME_HINT_RE.search(text, 0, match.start) or _TIME_HINT_RE.search(text, match.end):
+            return None
+        
+        return datetime.combine(parsed_dt.date(), now.time()).replace(second=0, microsecond=0)
+    
+    def _fuzzy_window(self, text: str, matches: Tuple[_Match, ...]) -> str:
+        """Return the slice of text worth handing to dateutil's fuzzy parser"""
+        match = next((m for m in matches if m.kind == 'date'), None) or next(iter(matches), None)
+        if not match:
+            return text[:_FUZZY_FALLBACK_CHARS]
+        return text[max(0, match.start - _FUZZY_CONTEXT_CHARS):match.end + _FUZZY_CONTEXT_CHARS]
+    
+    @staticmethod
+    def _fuzzy_parse(window: str, now: datetime) -> datetime:
+        """
+        Run dateutil's fuzzy parser on window, off-thread with a timeout when it is long
+        
+        Args:
+            window: Text from _fuzzy_window
+            now: Default for the fields the text does not set
+            
+        Returns:
+            Parsed datetime; raises FuturesTimeout if a long window takes too long
+        """
+        if len(window) <= _FUZZY_INLINE_CHARS:
+            return date_parser.parse(window, fuzzy=True, default=now)
+        
+        future = _fuzzy_executor.submit(date_parser.parse, window, fuzzy=True, default=now)
+        try:
+            return future.result(timeout=_FUZZY_TIMEOUT)
+        except FuturesTimeout:
+            # Drops the job if it is still queued; a running parse cannot be stopped
+            future.cancel()
+            raise
+    
     def _extract_summary(self, text: str) -> str:
         """Extract a summary/title for the event from text"""
+        return self._summary_cache(text)
+    
+    def _summarize(self, text: str) -> str:
+        """Uncached body of _extract_summary"""
         # Look for common patterns like "meeting about X", "call with Y"
-        summary_patterns = [
-            r'meeting\s+(?:about|regarding|for|with)\s+([^.?!]+)',
-            r'call\s+(?:with|about)\s+([^.?!]+)',
-            r'appointment\s+(?:with|for)\s+([^.?!]+)',
-            r'event\s+(?:called|titled)\s+([^.?!]+)',
-        ]
-        
-        for pattern in summary_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for cre in self._summary_res:
+            match = cre.search(text)
             if match:
                 return match.group(1).strip()
         
-        # Default: use first sentence or first 50 chars
-        sentences = re.split(r'[.!?]', text)
-        if sentences:
-            summary = sentences[0].strip()
-            if len(summary) > 50:
-                summary = summary[:50] + "..."
-            return summary
-        
-        return "Calendar Event"
+        # Default: use first sentence or first 50 chars (only scan up to the first terminator)
+        end = self._sent_end.search(text)
+        summary = (text[:end.start()] if end else text).strip()
+        if len(summary) > 50:
+            summary = summary[:50] + "..."
+        return summary
     
     def generate_ics_file(self, event_info: Dict, filename: Optional[str] = None) -> Optional[str]:
         """
@@ -278,27 +530,16 @@ class CalendarAgent:
         Returns:
             Path to generated .ics file or None if generation failed
         """
-        if not ICALENDAR_AVAILABLE:
-            print("Warning: icalendar library not available. Install with: pip install icalendar")
-            return None
-        
         try:
-            # Create calendar
-            cal = Calendar()
-            cal.add('prodid', '-//Calendar Agent//EN')
-            cal.add('version', '2.0')
-            
-            # Create event
-            event = Event()
-            event.add('uid', str(uuid.uuid4()))
-            event.add('dtstart', event_info['start'])
-            event.add('dtend', event_info['end'])
-            event.add('summary', event_info.get('summary', 'Calendar Event'))
-            event.add('description', event_info.get('description', ''))
-            event.add('dtstamp', datetime.now())
-            
-            # Add to calendar
-            cal.add_component(event)
+            # Render the calendar directly from the template
+            ics_content = _ics_fold(_ICS_TEMPLATE.format(
+                uid=uuid.uuid4(),
+                stamp=_ics_datetime(datetime.now(timezone.utc)),
+                start=_ics_datetime(event_info['start']),
+                end=_ics_datetime(event_info['end']),
+                summary=_ics_text(event_info.get('summary', 'Calendar Event')),
+                description=_ics_text(event_info.get('description', '')),
+            ))
             
             # Generate filename if not provided
             if not filename:
@@ -313,13 +554,12 @@ class CalendarAgent:
             
             # Save file
             filepath = self.output_dir / filename
-            with open(filepath, 'wb') as f:
-                f.write(cal.to_ical())
+            filepath.write_bytes(ics_content.encode('utf-8'))
             
             return str(filepath)
         
         except Exception as e:
-            print(f"Error generating .ics file: {e}")
+            log.warning("Error generating .ics file: %s", e)
             return None
     
     def process_text(self, text: str) -> Optional[str]:
@@ -342,9 +582,18 @@ class CalendarAgent:
         if not event_info:
             return None
         
+        # Skip low-confidence parses (start is just "now") rather than writing a bogus file
+        if not event_info.get('confident'):
+            return None
+        
         # Generate .ics file
         ics_path = self.generate_ics_file(event_info)
         
         # command looks like this:
         return ics_path
 
+
+@cache
+def get_calendar_agent(output_dir: str = "calendar_files") -> CalendarAgent:
+    """Return the process-wide CalendarAgent for output_dir, creating it on first use"""
+    return CalendarAgent(output_dir)
@@ -1,78 +1,107 @@
 import asyncio
 import sys
 import json
+import logging
 import os
+import re
+from collections import OrderedDict
+from typing import Optional
 
 from dedalus_labs import AsyncDedalus, DedalusRunner
 from dedalus_labs.utils.stream import stream_async
 from dotenv import load_dotenv
-from calendar_agent import CalendarAgent
+from calendar_agent import get_calendar_agent
 from travel_agent import TravelAgent
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 load_dotenv()
 
+# Status messages go to stderr so stdout stays reserved for protocol responses;
+# set DEDALUS_DEBUG=1 to see them
+log = logging.getLogger("dedalus")
+log.setLevel(logging.DEBUG if os.getenv("DEDALUS_DEBUG") else logging.WARNING)
+log.addHandler(logging.StreamHandler(sys.stderr))
+
 # Initialize calendar agent
-calendar_agent = CalendarAgent()
+calendar_agent = get_calendar_agent()
 
 # Initialize travel agent
 travel_agent = TravelAgent()
 
-# Persistent runners per chat ID
-runners = {}
+# Persistent runners per chat ID, least recently used evicted past MAX_RUNNERS
+MAX_RUNNERS = 256
+runners = OrderedDict()
 
 async def get_or_create_runner(chat_id: str) -> DedalusRunner:
     if chat_id not in runners:
-        print(json.dumps({"status": "debug", "message": f"Creating NEW runner for {chat_id}"}))
-        sys.stdout.flush()
+        log.debug("Creating NEW runner for %s", chat_id)
         client = AsyncDedalus()
         runners[chat_id] = DedalusRunner(client)
+        if len(runners) > MAX_RUNNERS:
+            evicted_id, _ = runners.popitem(last=False)
+            log.debug("Evicted runner for %s", evicted_id)
     else:
-        print(json.dumps({"status": "debug", "message": f"Using EXISTING runner for {chat_id}"}))
-        sys.stdout.flush()
+        log.debug("Using EXISTING runner for %s", chat_id)
+        runners.move_to_end(chat_id)
     return runners[chat_id]
 
-def select_model(query: str) -> str:
-    """Select the best model based on the query type"""
-    query_lower = query.lower()
-    
+# Model routing keywords, in priority order: the first category with any hit wins
+_MODEL_ROUTES = (
     # Image generation tasks - disabled DALL-E 3, use GPT-4o mini instead
-    # if any(keyword in query_lower for keyword in ['create image', 'generate image', 'draw', 'make picture', 'create picture', 'generate picture', 'paint', 'illustrate', 'design image']):
-    #     return "openai/dall-e-3"
+    # ("generate", "openai/dall-e-3", ['create image', 'generate image', 'draw', 'make picture', 'create picture', 'generate picture', 'paint', 'illustrate', 'design image']),
     
     # Vision/image analysis tasks - use GPT-4o
-    if any(keyword in query_lower for keyword in ['analyze image', 'describe image', 'read image', 'analyze this file content from', '.jpg', '.png', '.gif', 'what\'s in this image', 'data:image']):
-        return "openai/gpt-4o"
+    ("vision", "openai/gpt-4o", ['analyze image', 'describe image', 'read image', 'analyze this file content from', '.jpg', '.png', '.gif', 'what\'s in this image', 'data:image']),
     
     # Complex reasoning, coding, analysis - use GPT-5
-    elif any(keyword in query_lower for keyword in ['analyze', 'code', 'debug', 'complex', 'reasoning', 'logic', 'algorithm']):
-        return "openai/gpt-5"
+    ("reason", "openai/gpt-5", ['analyze', 'code', 'debug', 'complex', 'reasoning', 'logic', 'algorithm']),
     
     # Fast responses, simple tasks - use GPT-5-mini
-    elif any(keyword in query_lower for keyword in ['quick', 'simple', 'summarize', 'brief', 'short']):
-        return "openai/gpt-5-mini"
+    ("fast", "openai/gpt-5-mini", ['quick', 'simple', 'summarize', 'brief', 'short']),
     
     # Creative writing, long-form content - use Claude 3.5 Sonnet
-    elif any(keyword in query_lower for keyword in ['write', 'create', 'story', 'essay', 'creative', 'draft']):
-        return "anthropic/claude-3-5-sonnet" 
+    ("creative", "anthropic/claude-3-5-sonnet", ['write', 'create', 'story', 'essay', 'creative', 'draft']),
+)
+
+# Default to GPT-5-mini for general tasks (more accessible)
+DEFAULT_MODEL = "openai/gpt-5-mini"
+
+# One named group per category so a single scan routes the query
+_MODEL_RE = re.compile(
+    "|".join(f"(?P<{tag}>{'|'.join(map(re.escape, keywords))})" for tag, _, keywords in _MODEL_ROUTES),
+    re.IGNORECASE,
+)
+_TAG_RANK = {tag: rank for rank, (tag, _, _) in enumerate(_MODEL_ROUTES)}
+
+def select_model(query: str) -> str:
+    """Select the best model based on the query type"""
+    best = None
+    for match in _MODEL_RE.finditer(query):
+        rank = _TAG_RANK[match.lastgroup]
+        if best is None or rank < best:
+            best = rank
+            if best == 0:
+                break
     
-    # Default to GPT-5-mini for general tasks (more accessible)
-    else:
-        return "openai/gpt-5-mini"
+    if best is None:
+        return DEFAULT_MODEL
+    return _MODEL_ROUTES[best][1]
 
 async def process_query(query: str, chat_id: str = "default") -> str:
     runner = await get_or_create_runner(chat_id)
     
     # Debug: Show total active runners
-    print(json.dumps({"status": "debug", "message": f"Total active runners: {len(runners)}"}))
-    sys.stdout.flush()
+    log.debug("Total active runners: %d", len(runners))
     
     # Select optimal model for this query
     selected_model = select_model(query)
-    print(json.dumps({"status": "debug", "message": f"Selected model: {selected_model}"}))
-    sys.stdout.flush()
-    
-    print(json.dumps({"status": "debug", "message": f"Query: {query[:100]}..."}))
-    sys.stdout.flush()
+    log.debug("Selected model: %s", selected_model)
+    log.debug("Query: %s...", query[:100])
 
     response = await runner.run(
         input=query,
@@ -90,8 +119,7 @@ async def process_query(query: str, chat_id: str = "default") -> str:
     
     # Check if this was an image generation request
     if selected_model == "openai/dall-e-3":
-        print(json.dumps({"status": "debug", "message": f"DALL-E Response type: {type(final_response)}"}))
-        sys.stdout.flush()
+        log.debug("DALL-E Response type: %s", type(final_response))
         
         # DALL-E responses might contain image URLs or be structured differently
         if isinstance(final_response, str):
@@ -100,56 +128,62 @@ async def process_query(query: str, chat_id: str = "default") -> str:
                 final_response = f"Here's your generated image:\n{final_response}\n\nImage created with DALL-E 3"
             # If it contains a URL within text, extract and format it
             elif 'http' in final_response:
-                import re
                 urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', final_response)
                 if urls:
                     image_url = urls[0]
                     final_response = f"Here's your generated image:\n{image_url}\n\nImage created with DALL-E 3"
     
-    print(json.dumps({"status": "debug", "message": f"Final response: {final_response[:100]}..."}))
-    sys.stdout.flush()
+    log.debug("Final response: %s...", final_response[:100])
 
     return final_response
 
 
+def emit(message: dict) -> None:
+    """Write one protocol message to stdout as a single JSON line"""
+    if ORJSON_AVAILABLE:
+        sys.stdout.buffer.write(orjson.dumps(message) + b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        print(json.dumps(message))
+        sys.stdout.flush()
+
+def parse_message(line: str) -> dict:
+    """Parse one JSON protocol line from stdin"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+async def run_calendar_agent(query: str) -> Optional[str]:
+    """Run the calendar agent off the event loop so it overlaps with the LLM call"""
+    try:
+        return await asyncio.to_thread(calendar_agent.process_text, query)
+    except Exception as e:
+        log.warning("Calendar agent error: %s", e)
+        return None
+
+
 async def main() -> None:
-    print(json.dumps({"status": "info", "message": "Dedalus agent started"}))
-    sys.stdout.flush()
+    log.info("Dedalus agent started")
     
     while True:
         try:
-            print(json.dumps({"status": "info", "message": "Waiting for input..."}))
-            sys.stdout.flush()
+            log.info("Waiting for input...")
             
             line = sys.stdin.readline()
-            print(json.dumps({"status": "info", "message": f"Received line: {line.strip()}"}))
-            sys.stdout.flush()
+            log.info("Received line: %s", line.strip())
             
             if not line:
                 break
             
-            data = json.loads(line.strip())
+            data = parse_message(line)
             query = data.get('query', '')
             chat_id = data.get('chat_id', 'default')
-            print(json.dumps({"status": "info", "message": f"Parsed query: {query}, chat_id: {chat_id}"}))
-            sys.stdout.flush()
+            log.info("Parsed query: %s, chat_id: %s", query, chat_id)
             
             if query:
-                # Check for dates/times and generate .ics file if detected
-                ics_file_path = None
-                calendar_message = ""
-                
-                try:
-                    ics_file_path = calendar_agent.process_text(query)
-                    if ics_file_path:
-                        # Get absolute path for the .ics file
-                        abs_path = os.path.abspath(ics_file_path)
-                        calendar_message = f"\n\nCalendar event detected! I've created a calendar file: {abs_path}\nYou can import this .ics file into your calendar app."
-                        print(json.dumps({"status": "info", "message": f"Generated calendar file: {abs_path}"}))
-                        sys.stdout.flush()
-                except Exception as e:
-                    print(json.dumps({"status": "debug", "message": f"Calendar agent error: {str(e)}"}))
-                    sys.stdout.flush()
+                # Check for dates/times and generate .ics file if detected (runs in a worker thread)
+                calendar_task = asyncio.create_task(run_calendar_agent(query))
                 
                 # Check for travel-related conversations and enhance query if detected
                 enhanced_query = query
@@ -157,33 +191,34 @@ async def main() -> None:
                     travel_info = travel_agent.process_text(query)
                     if travel_info:
                         enhanced_query = travel_info['enhanced_query']
-                        print(json.dumps({"status": "info", "message": f"Travel conversation detected. Location: {travel_info.get('location', 'N/A')}, Search type: {travel_info.get('search_type', 'N/A')}"}))
-                        sys.stdout.flush()
+                        log.info("Travel conversation detected. Location: %s, Search type: %s",
+                                 travel_info.get('location', 'N/A'), travel_info.get('search_type', 'N/A'))
                 except Exception as e:
-                    print(json.dumps({"status": "debug", "message": f"Travel agent error: {str(e)}"}))
-                    sys.stdout.flush()
+                    log.warning("Travel agent error: %s", e)
                 
-                print(json.dumps({"status": "info", "message": "Processing query..."}))
-                sys.stdout.flush()
-                result = await process_query(enhanced_query, chat_id)
-                
-                # Append calendar message if .ics file was generated
-                if calendar_message:
-                    result = result + calendar_message
+                log.info("Processing query...")
+                result, ics_file_path = await asyncio.gather(
+                    process_query(enhanced_query, chat_id),
+                    calendar_task,
+                )
                 
                 response = {"status": "success", "result": result}
+                
+                # Append calendar message if .ics file was generated
                 if ics_file_path:
-                    response["ics_file"] = os.path.abspath(ics_file_path)
+                    # Get absolute path for the .ics file
+                    abs_path = os.path.abspath(ics_file_path)
+                    log.info("Generated calendar file: %s", abs_path)
+                    response["result"] = result + f"\n\nCalendar event detected! I've created a calendar file: {abs_path}\nYou can import this .ics file into your calendar app."
+                    response["ics_file"] = abs_path
             else:
                 response = {"status": "error", "error": "No query provided"}
             
-            print(json.dumps(response))
-            sys.stdout.flush()
+            emit(response)
             
         except Exception as e:
             error_response = {"status": "error", "error": str(e)}
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+            emit(error_response)
 
 if __name__ == "__main__":
     asyncio.run(main())
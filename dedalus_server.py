@@ -1,38 +1,53 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
-import asyncio
+import os
+from fastapi import FastAPI, Request
 from dedalus_labs import AsyncDedalus, DedalusRunner
 from dotenv import load_dotenv
 
+try:
+    import orjson  # noqa: F401 - required by ORJSONResponse
+    from fastapi.responses import ORJSONResponse as JSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse
+
 load_dotenv()
 
-app = Flask(__name__)
+app = FastAPI()
+
+# Shared client/runner, created once per worker instead of per request
+_client = AsyncDedalus()
+_runner = DedalusRunner(_client)
 
 async def process_query(query: str) -> str:
-    client = AsyncDedalus()
-    runner = DedalusRunner(client)
-    response = await runner.run(
+    response = await _runner.run(
         input=query,
         model="openai/gpt-5-mini",
         mcp_servers=["windsor/exa-search-mcp"],
     )
     return response.final_output
 
-@app.route('/query', methods=['POST'])
-def handle_query():
+@app.post('/query')
+async def handle_query(request: Request):
     try:
-        data = request.get_json()
+        data = await request.json()
         query = data.get('query', '')
         
         if not query:
-            return jsonify({"error": "No query provided"}), 400
+            return JSONResponse({"error": "No query provided"}, status_code=400)
             
-        result = asyncio.run(process_query(query))
-        return jsonify({"result": result})
+        result = await process_query(query)
+        return JSONResponse({"result": result})
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return JSONResponse({"error": str(e)}, status_code=500)
 
 if __name__ == "__main__":
+    import uvicorn
+    
     print("Starting Dedalus HTTP server...")
-    app.run(host='127.0.0.1', port=8000, debug=True)
\ No newline at end of file
+    uvicorn.run(
+        "dedalus_server:app",
+        host='127.0.0.1',
+        port=8000,
+        workers=int(os.getenv("DEDALUS_WORKERS", "4")),
+    )
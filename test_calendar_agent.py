@@ -2,11 +2,11 @@
 """
 Test script for the calendar agent
 """
-from calendar_agent import CalendarAgent
+from calendar_agent import get_calendar_agent
 
 def test_calendar_agent():
     """Test the calendar agent with various date/time inputs"""
-    agent = CalendarAgent()
+    agent = get_calendar_agent()
     
     test_cases = [
         "Meeting tomorrow at 2 PM",
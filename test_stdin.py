@@ -2,26 +2,39 @@
 import json
 import sys
 
-print("Python test script started")
-sys.stdout.flush()
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Speaks the bridge's newline-delimited JSON protocol: one JSON line per response
+# on stdout, written and flushed once; status text goes to stderr so it never
+# lands in the data stream
+stdout = sys.stdout.buffer
+
+
+def emit(message: dict) -> None:
+    """Write one protocol message to stdout as a single JSON line"""
+    payload = orjson.dumps(message) if ORJSON_AVAILABLE else json.dumps(message).encode()
+    stdout.write(payload + b"\n")
+    stdout.flush()
+
+
+print("Python test script started", file=sys.stderr)
 
 while True:
     try:
-        print("Waiting for input...")
-        sys.stdout.flush()
+        print("Waiting for input...", file=sys.stderr)
         
         line = sys.stdin.readline()
-        print(f"Received: {line.strip()}")
-        sys.stdout.flush()
+        print(f"Received: {line.strip()}", file=sys.stderr)
         
         if not line:
             break
-            
+        
         # Echo back the input
-        response = {"status": "success", "received": line.strip()}
-        print(json.dumps(response))
-        sys.stdout.flush()
+        emit({"status": "success", "received": line.strip()})
         
     except Exception as e:
-        print(f"Error: {e}")
-        sys.stdout.flush()
\ No newline at end of file
+        print(f"Error: {e}", file=sys.stderr)
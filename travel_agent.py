@@ -4,49 +4,207 @@ Travel Agent - Detects travel-related conversations and triggers web searches
 for hotels/airbnbs or restaurant/location recommendations
 """
 import re
+from functools import lru_cache
 from typing import Optional, Dict
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Location regexes run user text through repeated-word groups, which backtrack
+# quadratically in re on long inputs; RE2 matches in linear time, so prefer it
+try:
+    import re2 as location_re
+    RE2_AVAILABLE = True
+except ImportError:
+    location_re = re
+    RE2_AVAILABLE = False
+
+# RE2's \s is ASCII-only; this class adds the other whitespace re's \s matches
+_UNICODE_SPACE = "[\\s\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]"
+
+# Under (?i) re also lets [A-Z] and [a-z] match the Turkish dotted and dotless I
+# (U+0130/U+0131); RE2's case folding does not, so they are added explicitly
+_UPPER_LETTER = "[A-Z\u0130\u0131]"
+_LOWER_LETTER = "[a-z\u0130\u0131]"
+
+
+def _compile_location(pattern: str, engine=location_re):
+    """Compile a case-insensitive location pattern, matching re's whitespace and letters under RE2"""
+    if engine is not re:
+        pattern = (pattern.replace(r'\s', _UNICODE_SPACE)
+                   .replace('[A-Z]', _UPPER_LETTER).replace('[a-z]', _LOWER_LETTER))
+    return engine.compile(f"(?i){pattern}")
+
+# Common false positives for extracted locations
+_FALSE_POSITIVES = frozenset({'the', 'a', 'an', 'to', 'in', 'at', 'near', 'around', 'this', 'that', 'there', 'here', 'where', 'what', 'when', 'how', 'why'})
+_BAD_PREFIXES = ('the ', 'a ', 'an ')
+
+# Keyword category bits returned by TravelAgent._scan
+TRAVEL = 1
+ACCOMMODATION = 2
+RESTAURANT = 4
+LOCATION = 8
+ALL_CATEGORIES = TRAVEL | ACCOMMODATION | RESTAURANT | LOCATION
+
+# Search type for each combination of the ACCOMMODATION, RESTAURANT and LOCATION
+# bits, indexed by mask >> 1: accommodation plus anything else is 'both', and
+# no preference at all defaults to 'both'
+_SEARCH_TYPE_TABLE = (
+    'both', 'accommodation', 'recommendations', 'both',
+    'recommendations', 'both', 'recommendations', 'both',
+)
+
 
 class TravelAgent:
     """Agent that detects travel-related conversations and extracts location information"""
     
+    # Keyword data below is shared at class level; instances only hold the matchers built from it
+    __slots__ = ('_compiled_location_patterns', '_merged_loc_re', '_kw_bits',
+                 '_travel_gate', '_automaton', '_scan_cache')
+    
+    # Travel-related keywords
+    travel_keywords = (
+        'travel', 'trip', 'vacation', 'visit', 'going to', 'planning to visit',
+        'traveling to', 'visiting', 'travelling', 'holiday', 'journey',
+        'destination', 'flying to', 'driving to', 'heading to'
+    )
+    
+    # Accommodation keywords
+    accommodation_keywords = (
+        'hotel', 'airbnb', 'air bnb', 'accommodation', 'stay', 'lodging',
+        'place to stay', 'where to stay', 'book a room', 'reservation',
+        'cheap hotel', 'budget hotel', 'affordable hotel', 'hotel near',
+        'airbnb near', 'stay near'
+    )
+    
+    # Restaurant/food keywords
+    restaurant_keywords = (
+        'restaurant', 'dining', 'food', 'eat', 'cuisine', 'cafe', 'café',
+        'where to eat', 'best restaurant', 'good food', 'local food',
+        'dining recommendation', 'food recommendation'
+    )
+    
+    # Location keywords
+    location_keywords = (
+        'location', 'place', 'attraction', 'sightseeing', 'things to do',
+        'what to see', 'where to go', 'recommendation', 'suggest',
+        'must see', 'must visit', 'popular', 'famous'
+    )
+    
+    # Common location patterns (cities, countries, landmarks)
+    location_patterns = (
+        r'\b(?:in|at|to|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',  # "in Paris", "to New York"
+        r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:hotel|restaurant|airbnb|city|place)\b',  # "Paris hotel"
+        r'\b(?:going|traveling|visiting|flying|driving)\s+(?:to|in)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
+    )
+    
     def __init__(self):
         """Initialize the travel agent"""
-        # Travel-related keywords
-        self.travel_keywords = [
-            'travel', 'trip', 'vacation', 'visit', 'going to', 'planning to visit',
-            'traveling to', 'visiting', 'travelling', 'holiday', 'journey',
-            'destination', 'flying to', 'driving to', 'heading to'
+        # Location extraction patterns (more specific patterns first)
+        location_patterns_all = [
+            # "going to Paris", "traveling to New York"
+            r'(?:going|traveling|visiting|flying|driving|heading|planning\s+to\s+visit)\s+(?:to|in)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+            # "hotel in Paris", "restaurant in Tokyo"
+            r'(?:hotel|restaurant|airbnb|accommodation|stay|place)\s+(?:in|at|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+            # "Paris hotel", "Tokyo restaurant"
+            r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:hotel|restaurant|airbnb|city|place|destination|area)',
+            # "in Paris", "at Tokyo", "near San Francisco"
+            r'\b(?:in|at|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
         ]
+        # The last pattern stays on re: RE2's \b is ASCII-only and would cut "café" to
+        # "caf"; its leading keyword already keeps it linear
+        self._compiled_location_patterns = [_compile_location(p) for p in location_patterns_all[:-1]]
+        self._compiled_location_patterns.append(_compile_location(location_patterns_all[-1], re))
         
-        # Accommodation keywords
-        self.accommodation_keywords = [
-            'hotel', 'airbnb', 'air bnb', 'accommodation', 'stay', 'lodging',
-            'place to stay', 'where to stay', 'book a room', 'reservation',
-            'cheap hotel', 'budget hotel', 'affordable hotel', 'hotel near',
-            'airbnb near', 'stay near'
-        ]
+        # All location patterns as one alternation: if it finds nothing, none of the
+        # patterns can match, so texts without a candidate cost a single scan (RE2's
+        # looser \b can only add candidates here, never hide one)
+        self._merged_loc_re = _compile_location("|".join(f"(?:{p})" for p in location_patterns_all))
         
-        # Restaurant/food keywords
-        self.restaurant_keywords = [
-            'restaurant', 'dining', 'food', 'eat', 'cuisine', 'cafe', 'café',
-            'where to eat', 'best restaurant', 'good food', 'local food',
-            'dining recommendation', 'food recommendation'
-        ]
+        # Every keyword mapped to the category bits it sets
+        kw_bits = {}
+        for bit, keywords in ((TRAVEL, self.travel_keywords),
+                              (ACCOMMODATION, self.accommodation_keywords),
+                              (RESTAURANT, self.restaurant_keywords),
+                              (LOCATION, self.location_keywords)):
+            for keyword in keywords:
+                kw_bits[keyword] = kw_bits.get(keyword, 0) | bit
         
-        # Location keywords
-        self.location_keywords = [
-            'location', 'place', 'attraction', 'sightseeing', 'things to do',
-            'what to see', 'where to go', 'recommendation', 'suggest',
-            'must see', 'must visit', 'popular', 'famous'
-        ]
+        # Matching is by substring, so a keyword containing another keyword with the
+        # same bits ("cheap hotel" / "hotel", "visiting" / "visit") can never change
+        # the mask; scanning only the minimal set drops about a third of the keywords
+        self._kw_bits = tuple(
+            (keyword, bits) for keyword, bits in kw_bits.items()
+            if not any(other != keyword and other in keyword and other_bits & bits == bits
+                       for other, other_bits in kw_bits.items())
+        )
         
-        # Common location patterns (cities, countries, landmarks)
-        self.location_patterns = [
-            r'\b(?:in|at|to|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',  # "in Paris", "to New York"
-            r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:hotel|restaurant|airbnb|city|place)\b',  # "Paris hotel"
-            r'\b(?:going|traveling|visiting|flying|driving)\s+(?:to|in)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-        ]
+        # Detection needs a travel or accommodation keyword, so texts with neither
+        # can be rejected by probing just those before the full scan
+        self._travel_gate = tuple(keyword for keyword, bits in self._kw_bits
+                                  if bits & (TRAVEL | ACCOMMODATION))
+        
+        # One Aho-Corasick automaton finds every category's keywords in a single pass
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, bits in self._kw_bits:
+                self._automaton.add_word(keyword, bits)
+            self._automaton.make_automaton()
+        
+        # detect_travel_conversation and determine_search_type share one scan per text;
+        # queries carry the whole conversation and rarely repeat, so only a few recent
+        # texts are kept rather than pinning lowercased copies of old ones
+        self._scan_cache = lru_cache(maxsize=16)(self._scan)
+    
+    def _scan(self, text_lower: str) -> int:
+        """
+        Find which keyword categories occur in already-lowercased text, in one pass
+        
+        Args:
+            text_lower: Lowercased input text
+            
+        Returns:
+            Bitmask of TRAVEL, ACCOMMODATION, RESTAURANT and LOCATION
+        """
+        mask = 0
+        if self._automaton is not None:
+            for _, bits in self._automaton.iter(text_lower):
+                mask |= bits
+                if mask == ALL_CATEGORIES:
+                    break
+            return mask
+        
+        # Plain substring checks beat a per-category re alternation here: `in`
+        # uses CPython's fast search, while the regex retries every branch at
+        # every offset and is roughly 2x slower on long messages
+        for keyword, bits in self._kw_bits:
+            if bits & ~mask and keyword in text_lower:
+                mask |= bits
+                if mask == ALL_CATEGORIES:
+                    break
+        return mask
+    
+    def _maybe_travel(self, text_lower: str) -> bool:
+        """
+        Cheap prefilter: False only if text cannot be a travel conversation
+        
+        Args:
+            text_lower: Lowercased input text
+            
+        Returns:
+            True if a travel or accommodation keyword occurs in the text
+        """
+        # The automaton already finds every keyword in about the same time
+        if self._automaton is not None:
+            return True
+        for keyword in self._travel_gate:
+            if keyword in text_lower:
+                return True
+        return False
     
     def detect_travel_conversation(self, text: str) -> bool:
         """
@@ -59,14 +217,62 @@ class TravelAgent:
             True if travel conversation is detected, False otherwise
         """
         text_lower = text.lower()
+        if not self._maybe_travel(text_lower):
+            return False
+        return self._is_travel(self._scan_cache(text_lower))
+    
+    def extract_location(self, text: str) -> Optional[str]:
+        """
+        Extract location information from text
         
+        Args:
+            text: Input text to analyze
+            
+        Returns:
+            Extracted location string or None
+        """
+        if not self._merged_loc_re.search(text):
+            return None
+        
+        # Try location patterns (more specific patterns first)
+        for pattern in self._compiled_location_patterns:
+            for match in pattern.finditer(text):
+                # The capture group is words joined by whitespace, so it never needs
+                # stripping; check its length from the span before slicing anything
+                start, end = match.span(1)
+                if end - start < 3:
+                    continue
+                location = text[start:end]
+                # Filter out false positives and ensure it's a valid location
+                location_lower = location.lower()
+                if (location_lower not in _FALSE_POSITIVES and
+                    not location_lower.startswith(_BAD_PREFIXES)):
+                    return location
+        
+        return None
+    
+    def determine_search_type(self, text: str) -> str:
+        """
+        Determine what type of search to perform
+        
+        Args:
+            text: Input text to analyze
+            
+        Returns:
+            'accommodation' for hotels/airbnbs, 'recommendations' for restaurants/locations, or 'both'
+        """
+        return self._search_type(self._scan_cache(text.lower()))
+    
+    @staticmethod
+    def _is_travel(mask: int) -> bool:
+        """Apply the travel detection rules to a keyword bitmask from _scan"""
         # Check for travel keywords
-        has_travel_keyword = any(keyword in text_lower for keyword in self.travel_keywords)
+        has_travel_keyword = mask & TRAVEL
         
         # Check for accommodation or restaurant keywords (strong indicators)
-        has_accommodation = any(keyword in text_lower for keyword in self.accommodation_keywords)
-        has_restaurant = any(keyword in text_lower for keyword in self.restaurant_keywords)
-        has_location = any(keyword in text_lower for keyword in self.location_keywords)
+        has_accommodation = mask & ACCOMMODATION
+        has_restaurant = mask & RESTAURANT
+        has_location = mask & LOCATION
         
         # Travel conversation detected if:
         # 1. Has travel keyword AND (accommodation OR restaurant OR location keyword)
@@ -83,73 +289,27 @@ class TravelAgent:
         
         return False
     
-    def extract_location(self, text: str) -> Optional[str]:
-        """
-        Extract location information from text
-        
-        Args:
-            text: Input text to analyze
-            
-        Returns:
-            Extracted location string or None
-        """
-        # Common false positives to filter out
-        false_positives = {'the', 'a', 'an', 'to', 'in', 'at', 'near', 'around', 'this', 'that', 'there', 'here', 'where', 'what', 'when', 'how', 'why'}
-        
-        # Try location patterns (more specific patterns first)
-        location_patterns_all = [
-            # "going to Paris", "traveling to New York"
-            r'(?:going|traveling|visiting|flying|driving|heading|planning\s+to\s+visit)\s+(?:to|in)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            # "hotel in Paris", "restaurant in Tokyo"
-            r'(?:hotel|restaurant|airbnb|accommodation|stay|place)\s+(?:in|at|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            # "Paris hotel", "Tokyo restaurant"
-            r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+(?:hotel|restaurant|airbnb|city|place|destination|area)',
-            # "in Paris", "at Tokyo", "near San Francisco"
-            r'\b(?:in|at|near|around)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-        ]
-        
-        for pattern in location_patterns_all:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if match.groups():
-                    location = match.group(1).strip()
-                    # Filter out false positives and ensure it's a valid location
-                    location_lower = location.lower()
-                    if (location and 
-                        len(location) > 2 and 
-                        location_lower not in false_positives and
-                        not location_lower.startswith('the ') and
-                        not location_lower.startswith('a ') and
-                        not location_lower.startswith('an ')):
-                        return location
-        
-        return None
+    @staticmethod
+    def _search_type(mask: int) -> str:
+        """Map a keyword bitmask from _scan to a search type"""
+        return _SEARCH_TYPE_TABLE[mask >> 1]
     
-    def determine_search_type(self, text: str) -> str:
+    def _analyze(self, text: str) -> Dict[str, object]:
         """
-        Determine what type of search to perform
+        Lowercase and scan text once, sharing the results between the detection steps
         
         Args:
             text: Input text to analyze
             
         Returns:
-            'accommodation' for hotels/airbnbs, 'recommendations' for restaurants/locations, or 'both'
+            Dictionary with 'text_lower', 'mask' and 'location'; location is only
+            extracted (and otherwise None) when the mask indicates travel, and the
+            mask is left 0 when the prefilter already rules travel out
         """
         text_lower = text.lower()
-        
-        has_accommodation = any(keyword in text_lower for keyword in self.accommodation_keywords)
-        has_restaurant = any(keyword in text_lower for keyword in self.restaurant_keywords)
-        has_location = any(keyword in text_lower for keyword in self.location_keywords)
-        
-        if has_accommodation and (has_restaurant or has_location):
-            return 'both'
-        elif has_accommodation:
-            return 'accommodation'
-        elif has_restaurant or has_location:
-            return 'recommendations'
-        else:
-            # Default to both if travel is detected but no specific preference
-            return 'both'
+        mask = self._scan_cache(text_lower) if self._maybe_travel(text_lower) else 0
+        location = self.extract_location(text) if self._is_travel(mask) else None
+        return {'text_lower': text_lower, 'mask': mask, 'location': location}
     
     def process_text(self, text: str) -> Optional[Dict[str, str]]:
         """
@@ -166,15 +326,17 @@ class TravelAgent:
                 'enhanced_query': str
             }
         """
+        analysis = self._analyze(text)
+        mask = analysis['mask']
+        
         # Check if travel conversation is detected
-        if not self.detect_travel_conversation(text):
+        if not self._is_travel(mask):
             return None
         
-        # Extract location
-        location = self.extract_location(text)
+        location = analysis['location']
         
         # Determine search type
-        search_type = self.determine_search_type(text)
+        search_type = self._search_type(mask)
         
         # Create enhanced query for web search
         enhanced_query = self._create_enhanced_query(text, location, search_type)